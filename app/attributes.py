@@ -0,0 +1,99 @@
+import re
+from collections import deque
+from functools import lru_cache
+
+DEFAULT_ATTRIBUTE_LABELS = ("Design Code", "Color", "Fabric", "Work Details")
+
+def _fold(text):
+    # Per-character lowercase that keeps the length ('İ'.lower() is two code
+    # points), so match offsets stay valid on the original text.
+    return "".join(c.lower()[0] for c in text)
+
+class LabelMatcher:
+    """Aho-Corasick automaton over a fixed label list (case-insensitive).
+
+    One scan of the text reports every label occurrence, so the cost does not
+    grow with the number of labels being extracted.
+    """
+
+    def __init__(self, labels):
+        self.labels = tuple(dict.fromkeys(l.strip() for l in labels if l and l.strip()))
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        for i, label in enumerate(self.labels):
+            node = 0
+            for ch in _fold(label):
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][ch] = nxt
+                    self._goto.append({}); self._fail.append(0); self._out.append([])
+                node = nxt
+            self._out[node].append(i)
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                f = self._fail[node]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                cand = self._goto[f].get(ch, 0)
+                self._fail[nxt] = cand if cand != nxt else 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def finditer(self, text):
+        """Yield (label_index, end_offset) for every label occurrence in text."""
+        node = 0
+        goto, fail, out = self._goto, self._fail, self._out
+        for pos, ch in enumerate(_fold(text)):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for i in out[node]:
+                yield i, pos + 1
+
+@lru_cache(maxsize=32)
+def label_matcher(labels):
+    return LabelMatcher(labels)
+
+_VALUE_RE = re.compile(r"\s*:\s*([^\n\r]+)")
+
+def extract_attributes(text, labels=DEFAULT_ATTRIBUTE_LABELS):
+    """Return {label: value} for every "Label: value" line found in text.
+
+    The first occurrence of each label wins, matching the old per-label
+    re.search behaviour; keys come back in label-list order.
+    """
+    if not text:
+        return {}
+    matcher = label_matcher(tuple(labels))
+    attrs = {}
+    for i, end in matcher.finditer(text):
+        label = matcher.labels[i]
+        if label in attrs:
+            continue
+        m = _VALUE_RE.match(text, end)
+        if m and m.group(1).strip():
+            attrs[label] = m.group(1).strip()
+            if len(attrs) == len(matcher.labels):
+                break
+    return {l: attrs[l] for l in matcher.labels if l in attrs}
+
+def parse_labels(text):
+    """Split a comma/newline separated label list from the form."""
+    return [x.strip() for x in re.split(r"[,\n]", text or "") if x.strip()]
+
+def unique_labels(labels):
+    """Drop labels that map to an already-seen metafield key ("color" vs "Color")."""
+    seen, out = set(), []
+    for label in labels:
+        key = metafield_key(label)
+        if key not in seen:
+            seen.add(key); out.append(label)
+    return out
+
+def metafield_key(label):
+    key = re.sub(r"[^a-z0-9]+", "_", (label or "").strip().lower())
+    return key.strip("_") or "attribute"
@@ -0,0 +1,92 @@
+import json, threading, time
+from collections import OrderedDict
+from urllib.parse import urlparse, urlunparse
+
+def normalize_url(url: str) -> str:
+    p = urlparse((url or "").strip())
+    path = p.path.rstrip("/") or "/"
+    return urlunparse((p.scheme.lower(), p.netloc.lower(), path, "", p.query, ""))
+
+def make_key(*parts) -> str:
+    return json.dumps(parts, sort_keys=True, default=str, separators=(",", ":"))
+
+class TTLCache:
+    """Small thread-safe LRU with per-entry expiry."""
+
+    def __init__(self, maxsize=32, ttl=600):
+        self.maxsize, self.ttl = maxsize, ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+class SingleFlight:
+    """Run fn once per key; concurrent callers with the same key wait and share the result."""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+        try:
+            call.value = fn()
+            return call.value
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+def cached_call(cache: TTLCache, flight: SingleFlight, key, fn, cache_if=bool):
+    """Serve key from cache, otherwise compute it once across concurrent callers.
+
+    Results failing cache_if (by default: empty ones) are shared with the
+    in-flight waiters but not kept, so a transient failure is not pinned.
+    """
+    hit = cache.get(key)
+    if hit is not None:
+        return hit
+    def run():
+        hit = cache.get(key)
+        if hit is not None:
+            return hit
+        value = fn()
+        if cache_if(value):
+            cache.set(key, value)
+        return value
+    return flight.do(key, run)
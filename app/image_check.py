@@ -0,0 +1,132 @@
+import os, sqlite3, struct, threading, time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+
+HEADERS = {"User-Agent": "Mozilla/5.0"}
+CACHE_PATH = os.environ.get("IMAGE_CACHE_DB", "image_cache.sqlite3")
+CACHE_MAX_AGE = 7 * 24 * 3600
+PROBE_BYTES = 64 * 1024
+MAX_WORKERS = 16
+# Only these mean the image is gone; any other 4xx (429, 408, 403, ...) may be
+# rate limiting or a transient block, so the outcome stays unknown.
+DEAD_STATUSES = {400, 404, 410, 451}
+
+_db_lock = threading.Lock()
+
+def _connect(path):
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute("""CREATE TABLE IF NOT EXISTS images (
+        url TEXT PRIMARY KEY, ok INTEGER, final_url TEXT, status INTEGER,
+        content_length INTEGER, width INTEGER, height INTEGER, checked_at REAL)""")
+    return conn
+
+def image_size(data: bytes):
+    """(width, height) from the first bytes of a PNG/JPEG/GIF/WEBP, or (None, None)."""
+    if data[:8] == b"\x89PNG\r\n\x1a\n" and len(data) >= 24:
+        return struct.unpack(">II", data[16:24])
+    if data[:6] in (b"GIF87a", b"GIF89a") and len(data) >= 10:
+        return struct.unpack("<HH", data[6:10])
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP" and len(data) >= 30:
+        kind = data[12:16]
+        if kind == b"VP8 ":
+            w, h = struct.unpack("<HH", data[26:30])
+            return w & 0x3FFF, h & 0x3FFF
+        if kind == b"VP8L":
+            b = data[21:25]
+            return 1 + (((b[1] & 0x3F) << 8) | b[0]), 1 + (((b[3] & 0xF) << 10) | (b[2] << 2) | ((b[1] & 0xC0) >> 6))
+        if kind == b"VP8X":
+            return 1 + int.from_bytes(data[24:27], "little"), 1 + int.from_bytes(data[27:30], "little")
+    if data[:2] == b"\xff\xd8":
+        i = 2
+        while i + 9 < len(data):
+            if data[i] != 0xFF:
+                i += 1; continue
+            marker = data[i + 1]
+            if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7 or marker == 0xFF:
+                i += 1 if marker == 0xFF else 2; continue
+            seg_len = struct.unpack(">H", data[i + 2:i + 4])[0]
+            if marker in (0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF):
+                h, w = struct.unpack(">HH", data[i + 5:i + 9])
+                return w, h
+            i += 2 + seg_len
+    return None, None
+
+def _content_length(r):
+    total = (r.headers.get("Content-Range") or "").rpartition("/")[2]
+    if total.isdigit():
+        return int(total)
+    cl = r.headers.get("Content-Length") or ""
+    return int(cl) if cl.isdigit() and r.status_code == 200 else None
+
+def probe_image(session, url):
+    """Ranged GET of the first PROBE_BYTES, following redirects.
+
+    Returns a result dict, or None when the outcome is unknown (network error,
+    5xx, or a 4xx outside DEAD_STATUSES such as 429) so that the URL is kept
+    and re-checked next time. A 2xx/3xx that is not an image (the common
+    soft-404 redirect to a homepage) counts as dead.
+    """
+    try:
+        with session.get(url, headers={"Range": f"bytes=0-{PROBE_BYTES - 1}"}, timeout=20,
+                         stream=True, allow_redirects=True) as r:
+            ok = r.status_code < 400
+            if not ok and r.status_code not in DEAD_STATUSES:
+                return None
+            head = b""
+            if ok:
+                for chunk in r.iter_content(chunk_size=8192):
+                    head += chunk
+                    if len(head) >= PROBE_BYTES:
+                        break
+            w, h = image_size(head) if ok else (None, None)
+            ctype = (r.headers.get("Content-Type") or "").lower()
+            if ok and not (ctype.startswith("image/") or w):
+                ok = False
+            return {"url": url, "ok": ok, "final_url": r.url if ok else "", "status": r.status_code,
+                    "content_length": _content_length(r) if ok else None, "width": w, "height": h}
+    except requests.RequestException:
+        return None
+
+def validate_images(urls, cache_path=None, max_workers=MAX_WORKERS):
+    """Probe every unique URL concurrently; returns {url: result} for URLs with a known outcome.
+
+    Results are kept in a SQLite cache so repeat exports skip verified URLs.
+    """
+    urls = list(dict.fromkeys(u for u in urls if u))
+    if not urls:
+        return {}
+    results = {}
+    with _db_lock:
+        conn = _connect(cache_path or CACHE_PATH)
+        try:
+            cutoff = time.time() - CACHE_MAX_AGE
+            for i in range(0, len(urls), 500):
+                batch = urls[i:i + 500]
+                q = f"SELECT url, ok, final_url, status, content_length, width, height FROM images WHERE checked_at >= ? AND url IN ({','.join('?' * len(batch))})"
+                for row in conn.execute(q, [cutoff] + batch):
+                    results[row[0]] = dict(zip(("url","ok","final_url","status","content_length","width","height"), row))
+                    results[row[0]]["ok"] = bool(row[1])
+        finally:
+            conn.close()
+
+    todo = [u for u in urls if u not in results]
+    if todo:
+        with requests.Session() as session:
+            adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+            session.mount("http://", adapter); session.mount("https://", adapter)
+            session.headers.update(HEADERS)
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                fresh = [r for r in pool.map(lambda u: probe_image(session, u), todo) if r]
+        now = time.time()
+        with _db_lock:
+            conn = _connect(cache_path or CACHE_PATH)
+            try:
+                with conn:
+                    conn.executemany("INSERT OR REPLACE INTO images VALUES (?,?,?,?,?,?,?,?)", [
+                        (r["url"], int(r["ok"]), r["final_url"], r["status"], r["content_length"], r["width"], r["height"], now)
+                        for r in fresh])
+            finally:
+                conn.close()
+        results.update({r["url"]: r for r in fresh})
+    return results
@@ -1,20 +1,30 @@
-import io, re
-from urllib.parse import urlparse
+import copy, io
 from fastapi import FastAPI, Request, Form
 from fastapi.responses import HTMLResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from jinja2 import Environment, FileSystemLoader, select_autoescape
 import pandas as pd
 
-from app.shopify_utils import build_shopify_rows, normalize_images_and_positions
-from app.scrapers.ansab_jahangir import scrape_collection_ansab, scrape_product_ansab
-from app.scrapers.generic import scrape_collection_generic, scrape_product_generic
+from app.attributes import DEFAULT_ATTRIBUTE_LABELS, parse_labels, unique_labels
+from app.pipeline import collect_with_fallback, scrape_product_any
+from app.cache import SingleFlight, TTLCache, cached_call, make_key, normalize_url
+from app.work_queue import NoWorkersError, open_queue, run_job
+from app import image_check
+from app.shopify_utils import build_shopify_rows, normalize_images_and_positions, product_angles
 
 app = FastAPI(title="Shopify CSV Scraper (Web)")
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
 
 env = Environment(loader=FileSystemLoader("app/templates"), autoescape=select_autoescape())
 
+# Concurrent identical requests share one run; finished scrapes/exports are reused for a while.
+_flight = SingleFlight()
+_products_cache = TTLCache(maxsize=16, ttl=900)
+_exports_cache = TTLCache(maxsize=32, ttl=600)
+
+# Set WORK_QUEUE_URL to hand product scrapes to `python -m app.worker` nodes.
+_work_queue = open_queue()
+
 # Health endpoints for Render
 @app.get("/healthz")
 @app.head("/healthz")
@@ -25,25 +35,31 @@ def healthz():
 def head_root():
     return HTMLResponse("", status_code=200)
 
-def collect_with_fallback(url: str, limit: int):
-    which = "ansab" if "ansabjahangirstudio.com" in urlparse(url).netloc else "generic"
-    if which == "ansab":
-        urls = scrape_collection_ansab(url) or scrape_collection_generic(url)
-    else:
-        urls = scrape_collection_generic(url)
-    if limit and len(urls) > limit:
-        urls = urls[:limit]
-    if not urls:
-        urls = [url]
-    return urls, which
-
-def scrape_product_any(url: str, which: str):
-    if which == "ansab":
+def scrape_products(collection_url: str, limit: int, labels=DEFAULT_ATTRIBUTE_LABELS):
+    """Returns (products, failed) where failed counts product pages that could not be scraped."""
+    urls, which = collect_with_fallback(collection_url, limit)
+    if _work_queue is not None:
+        payloads = [{"url": u, "which": which, "labels": list(labels)} for u in urls]
+        results = run_job(_work_queue, payloads)
+        scraped = [p for p in results if p]
+        return scraped, len(results) - len(scraped)
+    scraped, failed = [], 0
+    for u in urls:
         try:
-            return scrape_product_ansab(url)
+            scraped.append(scrape_product_any(u, which, labels))
         except Exception:
-            pass
-    return scrape_product_generic(url)
+            failed += 1
+    return scraped, failed
+
+def scrape_key(collection_url: str, limit: int, labels):
+    return make_key("scrape", normalize_url(collection_url), int(limit or 0), list(labels))
+
+def scrape_products_cached(collection_url: str, limit: int, labels=DEFAULT_ATTRIBUTE_LABELS):
+    key = scrape_key(collection_url, limit, labels)
+    # Only complete runs are kept: a partial catalog (e.g. storefront briefly 503ing)
+    # is still returned to the callers waiting on it, but never pinned.
+    return cached_call(_products_cache, _flight, key, lambda: scrape_products(collection_url, limit, labels),
+                       cache_if=lambda r: bool(r[0]) and r[1] == 0)
 
 @app.get("/", response_class=HTMLResponse)
 def index() -> HTMLResponse:
@@ -77,24 +93,19 @@ def generate(
     meta_fabric: bool = Form(True),
     meta_color: bool = Form(True),
     meta_work_details: bool = Form(True),
+    meta_extra_labels: str = Form(""),
+    validate_images: bool = Form(False),
 ):
-    urls, which = collect_with_fallback(collection_url, int(limit_products))
-
-    scraped = []
-    for u in urls:
-        try:
-            p = scrape_product_any(u, which)
-            p["vendor"] = p.get("vendor") or vendor_default
-            p["type"] = p.get("type") or product_type_fallback
-            if product_category: p["product_category"] = product_category
-            if extra_tags:
-                t = p.get("tags") or []
-                if isinstance(t, str): t = [t] if t else []
-                t.extend([x.strip() for x in extra_tags.split(",") if x.strip()])
-                p["tags"] = list(dict.fromkeys(t))
-            scraped.append(p)
-        except Exception:
-            continue
+    labels = tuple(unique_labels(list(DEFAULT_ATTRIBUTE_LABELS) + parse_labels(meta_extra_labels)))
+    extra_labels = list(labels[len(DEFAULT_ATTRIBUTE_LABELS):])
+    metafield_labels = []
+    if add_metafields:
+        metafield_labels = [label for label, flag in [
+            ("Design Code", meta_design_code),
+            ("Fabric", meta_fabric),
+            ("Color", meta_color),
+            ("Work Details", meta_work_details),
+        ] if flag] + extra_labels
 
     cfg = {
         "published": bool(published),
@@ -115,42 +126,39 @@ def generate(
         "image_alt_from_title": True,
         "image_strategy": image_strategy,
         "variant_image_strategy": variant_image_strategy,
+        "metafield_labels": metafield_labels,
+        "meta_namespace": meta_namespace,
+        "validate_images": bool(validate_images),
     }
-    rows = build_shopify_rows(scraped, cfg, price_field="price")
-    df = pd.DataFrame(rows)
-    df = normalize_images_and_positions(df, image_strategy=image_strategy, image_alt_from_title=True)
 
-    if add_metafields:
-        def norm_handle(t):
-            h = re.sub(r'[^a-z0-9\-]+','-', (t or '').strip().lower().replace(' ','-'))
-            return re.sub(r'-+','-', h).strip('-') or 'product'
-        value_map = {}
-        for pdat in scraped:
-            h = norm_handle(pdat.get('handle') or pdat.get('title'))
-            html = pdat.get('body_html') or pdat.get('description_html') or pdat.get('description') or ''
-            def grab(label):
-                m = re.search(rf"<strong>{label}:</strong>\s*([^<]+)", html, re.I)
-                return (m.group(1).strip() if m else '')
-            value_map[h] = {
-                'design_code': grab('Design Code'),
-                'fabric': grab('Fabric'),
-                'color': grab('Color'),
-                'work_details': grab('Work Details'),
-            }
-        selected = [label for label, flag in [
-            ("Design Code", meta_design_code),
-            ("Fabric", meta_fabric),
-            ("Color", meta_color),
-            ("Work Details", meta_work_details),
-        ] if flag]
-        for label in selected:
-            key = label.lower().replace(' ', '_')
-            col = f"{label} (product.metafields.{meta_namespace}.{key})"
-            if col not in df.columns: df[col] = ''
-            for h, idxs in df.groupby('Handle', sort=False).groups.items():
-                first = list(idxs)[0]
-                df.at[first, col] = value_map.get(h, {}).get(key, '')
+    def build_csv():
+        products, failed = scrape_products_cached(collection_url, int(limit_products), labels)
+        scraped = []
+        for p in products:
+            p = copy.deepcopy(p)
+            p["vendor"] = p.get("vendor") or vendor_default
+            p["type"] = p.get("type") or product_type_fallback
+            if product_category: p["product_category"] = product_category
+            if extra_tags:
+                t = p.get("tags") or []
+                if isinstance(t, str): t = [t] if t else []
+                t.extend([x.strip() for x in extra_tags.split(",") if x.strip()])
+                p["tags"] = list(dict.fromkeys(t))
+            scraped.append(p)
+        row_cfg = cfg
+        if validate_images:
+            checked = image_check.validate_images(u for p in scraped for u in product_angles(p))
+            row_cfg = dict(cfg, image_check=checked)
+        rows = build_shopify_rows(scraped, row_cfg, price_field="price")
+        df = pd.DataFrame(rows)
+        df = normalize_images_and_positions(df, image_strategy=image_strategy, image_alt_from_title=True)
+        return df.to_csv(index=False).encode("utf-8"), len(scraped), failed
 
-    csv_bytes = df.to_csv(index=False).encode("utf-8")
+    export_key = make_key("export", scrape_key(collection_url, int(limit_products), labels), cfg)
+    try:
+        csv_bytes, _, _ = cached_call(_exports_cache, _flight, export_key, build_csv,
+                                      cache_if=lambda r: r[1] > 0 and r[2] == 0)
+    except NoWorkersError:
+        return HTMLResponse("No scrape workers are running (WORK_QUEUE_URL is set).", status_code=503)
     return StreamingResponse(io.BytesIO(csv_bytes), media_type="text/csv",
         headers={"Content-Disposition": 'attachment; filename="shopify_products.csv"'})
@@ -0,0 +1,25 @@
+from urllib.parse import urlparse
+
+from app.attributes import DEFAULT_ATTRIBUTE_LABELS
+from app.scrapers.ansab_jahangir import scrape_collection_ansab, scrape_product_ansab
+from app.scrapers.generic import scrape_collection_generic, scrape_product_generic
+
+def collect_with_fallback(url: str, limit: int):
+    which = "ansab" if "ansabjahangirstudio.com" in urlparse(url).netloc else "generic"
+    if which == "ansab":
+        urls = scrape_collection_ansab(url) or scrape_collection_generic(url)
+    else:
+        urls = scrape_collection_generic(url)
+    if limit and len(urls) > limit:
+        urls = urls[:limit]
+    if not urls:
+        urls = [url]
+    return urls, which
+
+def scrape_product_any(url: str, which: str, labels=DEFAULT_ATTRIBUTE_LABELS):
+    if which == "ansab":
+        try:
+            return scrape_product_ansab(url, labels)
+        except Exception:
+            pass
+    return scrape_product_generic(url, labels)
@@ -1,14 +1,16 @@
 import re, json
 from urllib.parse import urljoin, urlparse
-import requests
 from bs4 import BeautifulSoup
 
+from app.attributes import DEFAULT_ATTRIBUTE_LABELS, extract_attributes
+from app.scrapers.fetch import fetch_html
+
 HEADERS = {"User-Agent": "Mozilla/5.0"}
 
-def _get_html(url, headers=None):
-    r = requests.get(url, headers=headers or HEADERS, timeout=45)
-    r.raise_for_status()
-    return r.text
+PRODUCT_SCOPE_CLASSES = ("product-details", "product-essential", "product-page", "product-details-page")
+
+def _get_html(url, headers=None, until=None, region_classes=()):
+    return fetch_html(url, headers=headers or HEADERS, timeout=45, until=until, region_classes=region_classes)
 
 def _abs(base, href):
     if not href: return ""
@@ -28,7 +30,8 @@ def _candidate_root(soup):
 
 def _is_probable_product(u):
     try:
-        html = _get_html(u)
+        # og:type / SKU markers usually sit early; no need to pull the rest of the page.
+        html = _get_html(u, until=lambda found: "og:product" in found or "sku" in found)
         s = BeautifulSoup(html, "html.parser")
         if s.find("meta", {"property":"og:type", "content":"product"}):
             return True
@@ -123,10 +126,11 @@ def _grab_text_after_heading(soup, heading_regex):
             parts.append(txt)
     return "\n\n".join(parts).strip()
 
-def scrape_product_ansab(url: str):
-    html = _get_html(url)
+def scrape_product_ansab(url: str, labels=DEFAULT_ATTRIBUTE_LABELS):
+    html = _get_html(url, until=lambda found: {"og:title", "jsonld:product", "region_end"} <= found,
+                     region_classes=PRODUCT_SCOPE_CLASSES)
     s = BeautifulSoup(html, "html.parser")
-    product_scope = s.select_one(".product-details, .product-essential, .product-page, .product-details-page") or s
+    product_scope = s.select_one(", ".join("." + c for c in PRODUCT_SCOPE_CLASSES)) or s
 
     title = ""
     og = s.find("meta", {"property":"og:title"}) or s.find("meta", {"name":"og:title"})
@@ -136,10 +140,7 @@ def scrape_product_ansab(url: str):
         title = h1.get_text(strip=True) if h1 else "Product"
 
     scope_txt = product_scope.get_text("\n", strip=True)
-    attrs = {}
-    for key in ("Design Code", "Color", "Fabric", "Work Details"):
-        m = re.search(rf"{key}\s*:\s*([^\n\r]+)", scope_txt, re.IGNORECASE)
-        if m: attrs[key] = m.group(1).strip()
+    attrs = extract_attributes(scope_txt, labels)
 
     price = sale_price = compare_at = ""
     for script in s.find_all("script", {"type":"application/ld+json"}):
@@ -176,10 +177,8 @@ def scrape_product_ansab(url: str):
     disclaimer = grab_section(re.compile(r"^Disclaimer$", re.I))
 
     html_parts = []
-    if attrs.get("Design Code"): html_parts.append(f"<p><strong>Design Code:</strong> {attrs['Design Code']}</p>")
-    if attrs.get("Color"): html_parts.append(f"<p><strong>Color:</strong> {attrs['Color']}</p>")
-    if attrs.get("Fabric"): html_parts.append(f"<p><strong>Fabric:</strong> {attrs['Fabric']}</p>")
-    if attrs.get("Work Details"): html_parts.append(f"<p><strong>Work Details:</strong> {attrs['Work Details']}</p>")
+    for key in DEFAULT_ATTRIBUTE_LABELS:
+        if attrs.get(key): html_parts.append(f"<p><strong>{key}:</strong> {attrs[key]}</p>")
     if product_details: html_parts.append(f"<h3>Product Details</h3><p>{product_details}</p>")
     if delivery: html_parts.append(f"<h3>Delivery Time</h3><p>{delivery}</p>")
     if care: html_parts.append(f"<h3>Care Instructions</h3><p>{care}</p>")
@@ -233,4 +232,5 @@ def scrape_product_ansab(url: str):
         "sku_map": sku_map,
         "tags": tags,
         "type": (tags[-1] if tags else ""),
+        "attributes": attrs,
     }
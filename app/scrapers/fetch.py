@@ -0,0 +1,103 @@
+import codecs, json
+from html.parser import HTMLParser
+import requests
+
+HEADERS = {"User-Agent": "Mozilla/5.0"}
+MAX_HTML_BYTES = 5 * 1024 * 1024
+CHUNK_SIZE = 16 * 1024
+
+VOID_TAGS = {"area","base","br","col","embed","hr","img","input","link","meta","param","source","track","wbr"}
+
+def _is_jsonld_product(text):
+    # Same test scrape_product_ansab applies to the parsed block.
+    try:
+        data = json.loads(text)
+    except Exception:
+        return False
+    return any(isinstance(d, dict) and d.get("@type") == "Product" for d in (data if isinstance(data, list) else [data]))
+
+class FieldWatcher(HTMLParser):
+    """Incremental HTML scan that records which product fields have appeared so far.
+
+    Markers in `found`: og:title, og:product, jsonld:product, sku, region_end
+    (the first element carrying one of `region_classes` has been closed).
+    """
+
+    def __init__(self, region_classes=()):
+        super().__init__(convert_charrefs=True)
+        self.found = set()
+        self.region_classes = set(region_classes)
+        self._stack = []
+        self._region_at = None
+        self._jsonld = None
+
+    def handle_starttag(self, tag, attrs):
+        a = dict(attrs)
+        # Same (exact, case-sensitive) tests as the BeautifulSoup lookups run on the result.
+        if tag == "meta":
+            if "og:title" in (a.get("property"), a.get("name")) and a.get("content"): self.found.add("og:title")
+            elif a.get("property") == "og:type" and a.get("content") == "product": self.found.add("og:product")
+        elif tag == "script" and (a.get("type") or "").lower() == "application/ld+json":
+            self._jsonld = []
+        if a.get("itemprop") == "sku" or {"sku","product-sku"} & set((a.get("class") or "").split()):
+            self.found.add("sku")
+        if tag in VOID_TAGS:
+            return
+        self._stack.append(tag)
+        if self._region_at is None and self.region_classes and self.region_classes & set((a.get("class") or "").split()):
+            self._region_at = len(self._stack) - 1
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if tag == "script" and self._jsonld is not None:
+            if _is_jsonld_product("".join(self._jsonld)):
+                self.found.add("jsonld:product")
+            self._jsonld = None
+        if tag in VOID_TAGS or tag not in self._stack:
+            return  # stray end tag
+        at = len(self._stack) - 1 - self._stack[::-1].index(tag)
+        region_open = self._region_at is not None and "region_end" not in self.found
+        if region_open and at < self._region_at:
+            return  # would implicitly close the region; only its own end tag may do that
+        if region_open and at == self._region_at:
+            self.found.add("region_end")
+        del self._stack[at:]
+
+    def handle_data(self, data):
+        if self._jsonld is not None:
+            self._jsonld.append(data)
+
+def fetch_html(url, headers=None, timeout=45, until=None, region_classes=(), max_bytes=MAX_HTML_BYTES):
+    """Stream a page and return its (possibly partial) HTML.
+
+    `until` is a predicate over FieldWatcher.found; once it holds the download
+    is aborted and only the HTML received so far is returned. The body is
+    always cut off at max_bytes.
+    """
+    with requests.get(url, headers=headers or HEADERS, timeout=timeout, stream=True) as r:
+        r.raise_for_status()
+        try:
+            decoder = codecs.getincrementaldecoder(r.encoding or "utf-8")(errors="replace")
+        except LookupError:
+            decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        watcher = FieldWatcher(region_classes) if until else None
+        parts, size = [], 0
+        for chunk in r.iter_content(chunk_size=CHUNK_SIZE):
+            if not chunk:
+                continue
+            chunk = chunk[:max_bytes - size]
+            size += len(chunk)
+            text = decoder.decode(chunk)
+            parts.append(text)
+            if watcher is not None:
+                watcher.feed(text)
+                if until(watcher.found):
+                    break
+            if size >= max_bytes:
+                break
+        parts.append(decoder.decode(b"", final=True))
+    return "".join(parts)
@@ -1,13 +1,13 @@
 from urllib.parse import urljoin
-import requests
 from bs4 import BeautifulSoup
 
+from app.attributes import DEFAULT_ATTRIBUTE_LABELS, extract_attributes
+from app.scrapers.fetch import fetch_html
+
 HEADERS = {"User-Agent": "Mozilla/5.0"}
 
 def scrape_collection_generic(url: str):
-    resp = requests.get(url, headers=HEADERS, timeout=30)
-    resp.raise_for_status()
-    soup = BeautifulSoup(resp.text, "html.parser")
+    soup = BeautifulSoup(fetch_html(url, headers=HEADERS, timeout=30), "html.parser")
     links = set()
     for a in soup.select("a[href]"):
         href = a.get("href")
@@ -18,10 +18,8 @@ def scrape_collection_generic(url: str):
             links.add(full.split("?")[0])
     return sorted(links)
 
-def scrape_product_generic(url: str):
-    resp = requests.get(url, headers=HEADERS, timeout=30)
-    resp.raise_for_status()
-    soup = BeautifulSoup(resp.text, "html.parser")
+def scrape_product_generic(url: str, labels=DEFAULT_ATTRIBUTE_LABELS):
+    soup = BeautifulSoup(fetch_html(url, headers=HEADERS, timeout=30), "html.parser")
 
     title = soup.find("h1")
     title = title.get_text(strip=True) if title else "Product"
@@ -52,6 +50,7 @@ def scrape_product_generic(url: str):
 
     desc_el = soup.select_one(".product-description, .description, #description, .tab-content, .product__description")
     description = desc_el.get_text(" ", strip=True) if desc_el else ""
+    attrs = extract_attributes((desc_el or soup).get_text("\n", strip=True), labels)
 
     return {
         "url": url,
@@ -61,4 +60,5 @@ def scrape_product_generic(url: str):
         "description": description,
         "options": {},
         "tags": [],
+        "attributes": attrs,
     }
@@ -1,6 +1,8 @@
 import io, re
 import pandas as pd
 
+from app.attributes import metafield_key
+
 SHOPIFY_COLUMNS = [
     "Handle","Title","Body (HTML)","Vendor","Product Category","Type","Tags","Published",
     "Option1 Name","Option1 Value",
@@ -11,6 +13,9 @@ SHOPIFY_COLUMNS = [
     "Image Src","Image Position","Image Alt Text","Gift Card","SEO Title","SEO Description","Status"
 ]
 
+def metafield_columns(labels, namespace="custom"):
+    return [(label, f"{label} (product.metafields.{namespace}.{metafield_key(label)})") for label in labels or []]
+
 def _normalize_handle(title):
     title = str(title or "")
     handle = title.strip().lower().replace(" ", "-")
@@ -97,6 +102,24 @@ def _angles_from(images, body_html=""):
             seen.add(key); out.append(u0)
     return out
 
+def product_angles(p):
+    """Image URLs the row builder will emit for a product, before any validation."""
+    body_html = _first_nonempty(p.get("body_html"), p.get("description_html"), p.get("description"), "")
+    images = _filter_images(p.get("images")) or _images_from_html(body_html)
+    return _angles_from(images, body_html)
+
+def _apply_image_check(urls, checked):
+    # Drop dead images and swap in redirect targets, keeping order and dropping new dupes.
+    out, seen = [], set()
+    for u in urls:
+        r = checked.get(u)
+        if r is not None and not r["ok"]:
+            continue
+        final = (r and r["final_url"]) or u
+        if final not in seen:
+            seen.add(final); out.append(final)
+    return out
+
 def build_shopify_rows(products, cfg, price_field="price"):
     rows = []
     published_str = "TRUE" if cfg.get("published", True) else "FALSE"
@@ -120,6 +143,10 @@ def build_shopify_rows(products, cfg, price_field="price"):
     image_alt_from_title = cfg.get("image_alt_from_title", True)
     image_strategy = (cfg.get("image_strategy") or "first_variant").lower()
     variant_image_strategy = (cfg.get("variant_image_strategy") or "rotate").lower()  # rotate | none
+    meta_cols = metafield_columns(cfg.get("metafield_labels"), cfg.get("meta_namespace") or "custom")
+    columns = SHOPIFY_COLUMNS + [col for _, col in meta_cols]
+
+    image_check = cfg.get("image_check")  # {url: probe result} from app.image_check.validate_images
 
     for p in products:
         title = p.get("title") or "Untitled Product"
@@ -139,8 +166,9 @@ def build_shopify_rows(products, cfg, price_field="price"):
         tags = ",".join(tags_clean)
 
         body_html = _first_nonempty(p.get("body_html"), p.get("description_html"), p.get("description"), "")
-        images = _filter_images(p.get("images")) or _images_from_html(body_html)
-        angles = _angles_from(images, body_html)
+        angles = product_angles(p)
+        if image_check is not None:
+            angles = _apply_image_check(angles, image_check)
 
         options = p.get("options") or {}
         sizes = options.get(option1_name) or options.get(option1_name.lower()) or options.get("Size") or []
@@ -173,7 +201,7 @@ def build_shopify_rows(products, cfg, price_field="price"):
             })
 
         def base_row():
-            r = {col: "" for col in SHOPIFY_COLUMNS}
+            r = {col: "" for col in columns}
             r.update({
                 "Handle": handle,
                 "Title": title,
@@ -208,6 +236,10 @@ def build_shopify_rows(products, cfg, price_field="price"):
                 "Variant Compare At Price": v["Variant Compare At Price"],
                 "Variant Inventory Qty": v["Variant Inventory Qty"],
             })
+            if idx == 0 and meta_cols:
+                attrs = p.get("attributes") or {}
+                for label, col in meta_cols:
+                    r[col] = attrs.get(label, "")
             if variant_image_strategy == "rotate" and angles:
                 r["Variant Image"] = angles[idx % len(angles)]
             if image_strategy == "first_variant" and idx == 0 and first_image:
@@ -227,7 +259,7 @@ def build_shopify_rows(products, cfg, price_field="price"):
             start_pos = 2; start_idx = 1
         pos = start_pos
         for img in angles[start_idx:]:
-            r = {col: "" for col in SHOPIFY_COLUMNS}
+            r = {col: "" for col in columns}
             r["Handle"] = handle
             r["Image Src"] = img
             r["Image Position"] = str(pos)
@@ -0,0 +1,251 @@
+import json, logging, os, sqlite3, time, uuid
+
+log = logging.getLogger(__name__)
+
+LEASE_SECONDS = int(os.environ.get("WORK_LEASE_SECONDS", "120"))
+# Stay under typical proxy request limits (~100 s); what finished by then is used.
+JOB_TIMEOUT = int(os.environ.get("WORK_JOB_TIMEOUT", "90"))
+# No task leased within this window means no worker is listening.
+START_TIMEOUT = int(os.environ.get("WORK_START_TIMEOUT", "15"))
+MAX_ATTEMPTS = 3
+JOB_TTL = 24 * 3600
+
+def open_queue(url=None):
+    """Work queue from a URL: redis://host:port/db or sqlite:///file.db.
+
+    SQLite URLs follow the SQLAlchemy convention: three slashes for a path
+    relative to the working directory, four for an absolute one
+    (sqlite:////tmp/queue.db).
+
+    Returns None when no queue is configured (WORK_QUEUE_URL unset), in which
+    case scraping stays in-process.
+    """
+    url = url if url is not None else os.environ.get("WORK_QUEUE_URL", "")
+    if not url:
+        return None
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisWorkQueue(url)
+    if url.startswith("sqlite:///"):
+        return SQLiteWorkQueue(url[len("sqlite:///"):])
+    raise ValueError(f"Unsupported WORK_QUEUE_URL: {url}")
+
+class NoWorkersError(RuntimeError):
+    pass
+
+def new_job_id():
+    return uuid.uuid4().hex
+
+class SQLiteWorkQueue:
+    """Single-file queue for local testing; every process opens the same file."""
+
+    def __init__(self, path):
+        self.path = path
+        with self._conn() as conn:
+            conn.execute("""CREATE TABLE IF NOT EXISTS tasks (
+                job_id TEXT, idx INTEGER, payload TEXT, state TEXT DEFAULT 'pending',
+                lease_until REAL DEFAULT 0, attempts INTEGER DEFAULT 0, result TEXT,
+                created_at REAL, PRIMARY KEY (job_id, idx))""")
+            conn.execute("CREATE INDEX IF NOT EXISTS tasks_state ON tasks (state, lease_until)")
+
+    def _conn(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return _Closing(conn)
+
+    def submit(self, job_id, payloads):
+        now = time.time()
+        with self._conn() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany("INSERT INTO tasks (job_id, idx, payload, created_at) VALUES (?,?,?,?)",
+                             [(job_id, i, json.dumps(p), now) for i, p in enumerate(payloads)])
+            conn.execute("DELETE FROM tasks WHERE created_at < ?", (now - JOB_TTL,))
+            conn.execute("COMMIT")
+
+    def lease(self, lease_seconds=LEASE_SECONDS):
+        now = time.time()
+        with self._conn() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._requeue_expired(conn, now)
+                row = conn.execute("SELECT job_id, idx, payload FROM tasks WHERE state='pending' "
+                                   "ORDER BY created_at, idx LIMIT 1").fetchone()
+                if row is not None:
+                    conn.execute("UPDATE tasks SET state='leased', lease_until=?, attempts=attempts+1 "
+                                 "WHERE job_id=? AND idx=?", (now + lease_seconds, row[0], row[1]))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return {"job_id": row[0], "idx": row[1], **json.loads(row[2])} if row else None
+
+    def _requeue_expired(self, conn, now):
+        conn.execute("UPDATE tasks SET state='failed', result='null' WHERE state='leased' AND lease_until < ? "
+                     "AND attempts >= ?", (now, MAX_ATTEMPTS))
+        conn.execute("UPDATE tasks SET state='pending' WHERE state='leased' AND lease_until < ?", (now,))
+
+    def complete(self, task, result):
+        state = "done" if result is not None else "failed"
+        with self._conn() as conn:
+            conn.execute("UPDATE tasks SET state=?, result=? WHERE job_id=? AND idx=? AND state != 'done'",
+                         (state, json.dumps(result), task["job_id"], task["idx"]))
+
+    def status(self, job_id):
+        with self._conn() as conn:
+            self._requeue_expired(conn, time.time())
+            counts = dict(conn.execute("SELECT state, COUNT(*) FROM tasks WHERE job_id=? GROUP BY state", (job_id,)))
+            started = conn.execute("SELECT COUNT(*) FROM tasks WHERE job_id=? AND attempts > 0", (job_id,)).fetchone()[0]
+        return {"total": sum(counts.values()), "started": started,
+                "finished": counts.get("done", 0) + counts.get("failed", 0)}
+
+    def results(self, job_id):
+        with self._conn() as conn:
+            rows = conn.execute("SELECT result FROM tasks WHERE job_id=? ORDER BY idx", (job_id,)).fetchall()
+        return [json.loads(r[0]) if r[0] else None for r in rows]
+
+    def delete(self, job_id):
+        with self._conn() as conn:
+            conn.execute("DELETE FROM tasks WHERE job_id=?", (job_id,))
+
+class _Closing:
+    def __init__(self, conn): self.conn = conn
+    def __enter__(self): return self.conn
+    def __exit__(self, *exc): self.conn.close()
+
+# Every state change that moves a task between `pending`, `leased` and the
+# results hash runs as one Lua script, so a node dying mid-way cannot drop a
+# task. Scripts only touch keys passed in KEYS, and all keys share the
+# "{prefix}" hash tag so they live in one Redis Cluster slot.
+
+# KEYS: pending, leased, attempts  ARGV: deadline, ttl
+_LEASE_LUA = """
+local id = redis.call('LPOP', KEYS[1])
+if not id then return nil end
+redis.call('ZADD', KEYS[2], ARGV[1], id)
+redis.call('HINCRBY', KEYS[3], id, 1)
+redis.call('EXPIRE', KEYS[3], ARGV[2])
+return id
+"""
+
+# KEYS: leased, pending, attempts, results  ARGV: task id, idx, now, max_attempts, ttl
+_REQUEUE_LUA = """
+local score = redis.call('ZSCORE', KEYS[1], ARGV[1])
+if not score or tonumber(score) > tonumber(ARGV[3]) then return 0 end
+redis.call('ZREM', KEYS[1], ARGV[1])
+if tonumber(redis.call('HGET', KEYS[3], ARGV[1]) or '0') >= tonumber(ARGV[4]) then
+  redis.call('HSETNX', KEYS[4], ARGV[2], 'null')
+  redis.call('EXPIRE', KEYS[4], ARGV[5])
+else
+  redis.call('RPUSH', KEYS[2], ARGV[1])
+end
+return 1
+"""
+
+# KEYS: leased, results  ARGV: task id, idx, result json or '' for failure, ttl
+# A late success may replace a failure, never the other way round.
+_COMPLETE_LUA = """
+redis.call('ZREM', KEYS[1], ARGV[1])
+if ARGV[3] == '' then
+  redis.call('HSETNX', KEYS[2], ARGV[2], 'null')
+else
+  redis.call('HSET', KEYS[2], ARGV[2], ARGV[3])
+end
+redis.call('EXPIRE', KEYS[2], ARGV[4])
+return 1
+"""
+
+class RedisWorkQueue:
+    """Shared queue for multi-node runs; needs the optional `redis` package."""
+
+    def __init__(self, url, prefix="scrape"):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("WORK_QUEUE_URL points at Redis but the 'redis' package is not installed") from e
+        self.r = redis.Redis.from_url(url, decode_responses=True)
+        self.p = "{" + prefix + "}"
+        self._lease = self.r.register_script(_LEASE_LUA)
+        self._requeue = self.r.register_script(_REQUEUE_LUA)
+        self._complete = self.r.register_script(_COMPLETE_LUA)
+
+    def _k(self, *parts):
+        return ":".join((self.p,) + tuple(str(x) for x in parts))
+
+    def submit(self, job_id, payloads):
+        pipe = self.r.pipeline()
+        pipe.hset(self._k("job", job_id, "tasks"), mapping={i: json.dumps(p) for i, p in enumerate(payloads)})
+        pipe.set(self._k("job", job_id, "total"), len(payloads))
+        for k in ("tasks", "total"):
+            pipe.expire(self._k("job", job_id, k), JOB_TTL)
+        pipe.rpush(self._k("pending"), *[f"{job_id}:{i}" for i in range(len(payloads))])
+        pipe.execute()
+
+    def lease(self, lease_seconds=LEASE_SECONDS):
+        self._requeue_expired()
+        task_id = self._lease(keys=[self._k("pending"), self._k("leased"), self._k("attempts")],
+                              args=[time.time() + lease_seconds, JOB_TTL])
+        if not task_id:
+            return None
+        job_id, idx = task_id.rsplit(":", 1)
+        payload = self.r.hget(self._k("job", job_id, "tasks"), idx)
+        if payload is None:  # job expired or was deleted
+            self.r.zrem(self._k("leased"), task_id)
+            return None
+        return {"job_id": job_id, "idx": int(idx), **json.loads(payload)}
+
+    def _requeue_expired(self):
+        now = time.time()
+        for task_id in self.r.zrangebyscore(self._k("leased"), 0, now):
+            job_id, idx = task_id.rsplit(":", 1)
+            self._requeue(keys=[self._k("leased"), self._k("pending"), self._k("attempts"), self._k("job", job_id, "results")],
+                          args=[task_id, idx, now, MAX_ATTEMPTS, JOB_TTL])
+
+    def complete(self, task, result):
+        self._complete(keys=[self._k("leased"), self._k("job", task["job_id"], "results")],
+                       args=[f"{task['job_id']}:{task['idx']}", task["idx"],
+                             json.dumps(result) if result is not None else "", JOB_TTL])
+
+    def status(self, job_id):
+        self._requeue_expired()
+        total = int(self.r.get(self._k("job", job_id, "total")) or 0)
+        attempts = self.r.hmget(self._k("attempts"), [f"{job_id}:{i}" for i in range(total)]) if total else []
+        return {"total": total, "started": sum(1 for a in attempts if a),
+                "finished": self.r.hlen(self._k("job", job_id, "results"))}
+
+    def results(self, job_id):
+        total = int(self.r.get(self._k("job", job_id, "total")) or 0)
+        if not total:
+            return []
+        raw = self.r.hmget(self._k("job", job_id, "results"), list(range(total)))
+        return [json.loads(v) if v else None for v in raw]
+
+    def delete(self, job_id):
+        total = int(self.r.get(self._k("job", job_id, "total")) or 0)
+        pipe = self.r.pipeline()
+        if total:
+            pipe.hdel(self._k("attempts"), *[f"{job_id}:{i}" for i in range(total)])
+        pipe.delete(*[self._k("job", job_id, k) for k in ("tasks", "total", "results")])
+        pipe.execute()
+
+def run_job(queue, payloads, poll=1.0, timeout=JOB_TIMEOUT, start_timeout=START_TIMEOUT):
+    """Coordinator side: enqueue payloads, wait for workers, return results in submit order.
+
+    Tasks not finished by `timeout` come back as None, like failed scrapes.
+    Raises NoWorkersError if no task was leased within `start_timeout`.
+    """
+    job_id = new_job_id()
+    queue.submit(job_id, payloads)
+    started_at = time.monotonic()
+    try:
+        while True:
+            st = queue.status(job_id)
+            if st["finished"] >= st["total"]:
+                return queue.results(job_id)
+            waited = time.monotonic() - started_at
+            if not st["started"] and waited > start_timeout:
+                raise NoWorkersError(f"no worker picked up job {job_id} within {start_timeout}s")
+            if waited > timeout:
+                log.warning("job %s timed out: %d/%d tasks finished", job_id, st["finished"], st["total"])
+                return queue.results(job_id)
+            time.sleep(poll)
+    finally:
+        queue.delete(job_id)
@@ -0,0 +1,43 @@
+import logging, os, threading, time
+
+from app.work_queue import open_queue
+
+log = logging.getLogger(__name__)
+
+MAX_BACKOFF = 30.0
+
+def run_worker(queue, scrape, stop=None, idle_sleep=1.0):
+    """Lease product-scrape tasks until stopped; a failed scrape is recorded as None.
+
+    Queue errors (connection blips, locked database) are logged and retried
+    with backoff; an unfinished lease simply expires and is retried elsewhere.
+    """
+    backoff = idle_sleep
+    while not (stop and stop.is_set()):
+        try:
+            task = queue.lease()
+            if task is None:
+                time.sleep(idle_sleep)
+                continue
+            try:
+                product = scrape(task["url"], task["which"], tuple(task.get("labels") or ()))
+            except Exception:
+                product = None
+            queue.complete(task, product)
+            backoff = idle_sleep
+        except Exception:
+            log.exception("work queue error; retrying in %.1fs", backoff)
+            time.sleep(backoff)
+            backoff = min(backoff * 2, MAX_BACKOFF)
+
+if __name__ == "__main__":
+    # python -m app.worker  (same image/env as the web app, WORK_QUEUE_URL required)
+    from app.pipeline import scrape_product_any
+    logging.basicConfig(level=logging.INFO)
+    queue = open_queue()
+    if queue is None:
+        raise SystemExit("WORK_QUEUE_URL is not set")
+    threads = [threading.Thread(target=run_worker, args=(queue, scrape_product_any), daemon=True)
+               for _ in range(int(os.environ.get("WORKER_THREADS", "4")))]
+    for t in threads: t.start()
+    for t in threads: t.join()